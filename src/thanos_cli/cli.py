@@ -5,10 +5,9 @@ from pathlib import Path
 from typing import Annotated, Optional
 
 import typer
-from rich.console import Console
 from rich.panel import Panel
 
-from .snap import snap
+from .snap import console, snap
 
 app = typer.Typer(
     name="thanos",
@@ -16,7 +15,60 @@ app = typer.Typer(
     add_completion=False,
     no_args_is_help=True,
 )
-console = Console()
+
+_THANOSIGNORE_TEMPLATE = b"""# Thanos Ignore File
+# Uses gitignore-style pattern matching
+# https://git-scm.com/docs/gitignore
+
+# Important directories (trailing slash matches directories)
+important/
+backup/
+docs/
+
+# Python
+venv/
+.venv/
+__pycache__/
+*.pyc
+
+# Node.js
+node_modules/
+
+# Database files
+*.db
+*.sqlite
+
+# Important data files (wildcards work like gitignore)
+*-important.*
+*-backup.*
+
+# Specific files
+secrets.json
+credentials.yaml
+
+# Thanos shouldn't snap himself
+.thanosignore
+.thanosrc.json
+"""
+
+_THANOSRC_TEMPLATE = json.dumps(
+    {
+        "weights": {
+            "by_extension": {
+                ".log": 0.9,
+                ".tmp": 0.95,
+                ".cache": 0.95,
+                ".bak": 0.8,
+                ".old": 0.8,
+                ".py": 0.3,
+                ".js": 0.3,
+                ".db": 0.1,
+                ".json": 0.2,
+            }
+        }
+    },
+    indent=2,
+).encode()
 
 
 @app.command(name="snap")
@@ -118,41 +170,7 @@ def init(
     # Create .thanosignore
     thanosignore_path = base_path / ".thanosignore"
     if not thanosignore_path.exists():
-        thanosignore_content = """# Thanos Ignore File
-# Uses gitignore-style pattern matching
-# https://git-scm.com/docs/gitignore
-
-# Important directories (trailing slash matches directories)
-important/
-backup/
-docs/
-
-# Python
-venv/
-.venv/
-__pycache__/
-*.pyc
-
-# Node.js
-node_modules/
-
-# Database files
-*.db
-*.sqlite
-
-# Important data files (wildcards work like gitignore)
-*-important.*
-*-backup.*
-
-# Specific files
-secrets.json
-credentials.yaml
-
-# Thanos shouldn't snap himself
-.thanosignore
-.thanosrc.json
-"""
-        thanosignore_path.write_text(thanosignore_content)
+        thanosignore_path.write_bytes(_THANOSIGNORE_TEMPLATE)
         console.print(f"[green]✓[/green] Created [bold]{thanosignore_path}[/bold]")
     else:
         console.print(f"[yellow]⚠️[/yellow]  {thanosignore_path} already exists")
@@ -160,22 +178,7 @@ credentials.yaml
     # Create .thanosrc.json
     thanosrc_path = base_path / ".thanosrc.json"
     if not thanosrc_path.exists():
-        thanosrc_content = {
-            "weights": {
-                "by_extension": {
-                    ".log": 0.9,
-                    ".tmp": 0.95,
-                    ".cache": 0.95,
-                    ".bak": 0.8,
-                    ".old": 0.8,
-                    ".py": 0.3,
-                    ".js": 0.3,
-                    ".db": 0.1,
-                    ".json": 0.2,
-                }
-            }
-        }
-        thanosrc_path.write_text(json.dumps(thanosrc_content, indent=2))
+        thanosrc_path.write_bytes(_THANOSRC_TEMPLATE)
         console.print(f"[green]✓[/green] Created [bold]{thanosrc_path}[/bold]")
     else:
         console.print(f"[yellow]⚠️[/yellow]  {thanosrc_path} already exists")
@@ -1,6 +1,54 @@
+import copy
 import json
+import os
+import re
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
+
+from .protection import clear_protection_cache
+
+try:
+    # Optional C parser ("thanos-cli[fast]"); it accepts bytes and raises json.JSONDecodeError subclasses
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover - depends on the environment
+    _json_loads = json.loads
+
+# A .thanosignore line that is neither blank nor a comment, captured without surrounding whitespace
+_IGNORE_LINE_RE = re.compile(r"^\s*([^#\s].*?)\s*$", re.MULTILINE)
+
+# Parsed config files keyed by path, stored with the file signature they were read at
+_config_cache: dict[tuple[str, Path], tuple[tuple[int, int, int, int], Any]] = {}
+
+
+def clear_cache() -> None:
+    """Forget cached config files and compiled protection patterns."""
+    _config_cache.clear()
+    clear_protection_cache()
+
+
+def _load_cached(kind: str, config_file: Path, loader: Callable[[Path], Any]) -> Any:
+    """
+    Return loader(config_file), reusing the previous result while the file is unchanged.
+
+    A file counts as unchanged while its inode, size, mtime and ctime all match the
+    cached entry. Replacing the file (as editors and `mv` do) changes the inode, and any
+    in-place write bumps ctime. The one case this cannot detect is an in-place rewrite
+    to the same size within the filesystem's timestamp granularity (coarse on some
+    filesystems, e.g. 2s on FAT); call clear_cache() if that matters.
+
+    The cached value is shared between callers, so loaders must return immutable values
+    or callers must copy them.
+    """
+    stat_result = config_file.stat()
+    signature = (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ctime_ns)
+    key = (kind, config_file)
+    cached = _config_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    value = loader(config_file)
+    _config_cache[key] = (signature, value)
+    return value
 
 
 def get_default_protected_patterns() -> set[str]:
@@ -58,16 +106,17 @@ def find_config_file(directory: str, filename: str) -> Optional[Path]:
     Search for a config file in the directory and parent directories.
     This allows .thanosignore to work from parent directories.
     """
-    current = Path(directory).resolve()
+    # Plain string paths: one isfile() stat per level, without pathlib overhead
+    current = os.path.realpath(directory)
 
     # Search up to 5 levels of parent directories
     for _ in range(5):
-        config_file = current / filename
-        if config_file.exists():
-            return config_file
+        config_file = os.path.join(current, filename)
+        if os.path.isfile(config_file):
+            return Path(config_file)
 
         # Move to parent directory
-        parent = current.parent
+        parent = os.path.dirname(current)
         if parent == current:  # Reached filesystem root
             break
         current = parent
@@ -81,28 +130,37 @@ def load_thanosignore(directory: str) -> tuple[set[str], Optional[Path]]:
     Returns (patterns, config_file_path).
     """
     ignore_file = find_config_file(directory, ".thanosignore")
-    patterns = set()
 
     if ignore_file:
-        with open(ignore_file) as f:
-            for line in f:
-                line = line.strip()
-                # Skip empty lines and comments
-                if line and not line.startswith("#"):
-                    patterns.add(line)
+        return set(_load_cached("thanosignore", ignore_file, _parse_thanosignore)), ignore_file
+
+    return set(), None
 
-    return patterns, ignore_file
+
+def _parse_thanosignore(ignore_file: Path) -> frozenset[str]:
+    """Read the patterns of a .thanosignore file, skipping blank lines and comments."""
+    with open(ignore_file) as f:
+        content = f.read()
+    return frozenset(_IGNORE_LINE_RE.findall(content))
 
 
 def load_thanosrc(directory: str) -> tuple[dict, Optional[Path]]:
     """
     Load configuration from .thanosrc.json file.
     Returns (config_dict, config_file_path).
+
+    The parsed config is cached until the file changes; every call returns a fresh copy,
+    so callers may modify it.
     """
     config_file = find_config_file(directory, ".thanosrc.json")
 
     if config_file:
-        with open(config_file) as f:
-            return json.load(f), config_file
+        return copy.deepcopy(_load_cached("thanosrc", config_file, _parse_thanosrc)), config_file
 
     return {}, None
+
+
+def _parse_thanosrc(config_file: Path) -> dict:
+    """Parse a .thanosrc.json file, with orjson when it is installed."""
+    with open(config_file, "rb") as f:
+        return _json_loads(f.read())
@@ -1,39 +1,116 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
 from pathlib import Path
 
 import pathspec
 
+# Named groups (pathspec uses "ps_d") that would clash once several pattern regexes are joined
+_NAMED_GROUP_RE = re.compile(r"\(\?P<\w+>")
+
+# Characters that make a pattern more than a plain file or directory name
+_GLOB_CHARS = frozenset("*?[\\")
+
 
-def should_protect_file(file: Path, base_path: Path, protected_patterns: set[str]) -> bool:
+class ProtectionSpec:
     """
-    Check if a file matches any protection pattern using gitignore-style matching.
+    Compiled protection patterns, matched against POSIX paths relative to the snap directory.
 
-    Args:
-        file: File path to check
-        base_path: Base directory path
-        protected_patterns: Set of gitignore-style patterns
+    Plain names such as ".git", "node_modules/" or "uv.lock" match any path component with
+    that exact name, so they are checked with a set lookup instead of a regex. The regexes
+    pathspec builds for the remaining patterns are joined into a single alternation, so a
+    path is checked with one regex match instead of one per pattern.
 
-    Returns:
-        True if file should be protected, False otherwise
+    Negated patterns ("!pattern") depend on pattern order, so specs containing them skip
+    both shortcuts and use pathspec's own matching.
     """
-    if not protected_patterns:
+
+    def __init__(self, spec: pathspec.PathSpec, literal_names: frozenset[str], glob_spec: pathspec.PathSpec):
+        self.spec = spec
+        self._literal_names = literal_names
+        self._glob_spec = glob_spec
+        self._glob_regex = _combine_include_patterns(glob_spec)
+
+    def __len__(self) -> int:
+        return len(self.spec)
+
+    def match(self, relative_path: str) -> bool:
+        """Return True if the relative POSIX path matches the protection patterns."""
+        if not self._literal_names.isdisjoint(relative_path.split("/")):
+            return True
+        if self._glob_regex is not None:
+            return self._glob_regex.match(relative_path) is not None
+        return self._glob_spec.match_file(relative_path)
+
+    def protects(self, relative_path: str) -> bool:
+        """Return True if the relative POSIX path or any of its parent directories matches."""
+        parts = relative_path.split("/")
+        if not self._literal_names.isdisjoint(parts):
+            return True
+
+        # E.g., for ".venv/bin/python", check ".venv", ".venv/bin", ".venv/bin/python"
+        for i in range(1, len(parts) + 1):
+            partial_path = "/".join(parts[:i])
+            if self._glob_regex is not None:
+                if self._glob_regex.match(partial_path) is not None:
+                    return True
+            elif self._glob_spec.match_file(partial_path):
+                return True
+
         return False
 
-    # Resolve both paths to handle absolute/relative path mismatches
-    file_resolved = file.resolve()
-    base_resolved = base_path.resolve()
 
-    try:
-        relative_path = file_resolved.relative_to(base_resolved)
-    except ValueError:
-        # File is outside base_path - this shouldn't happen in normal operation
-        # But if it does, we should protect it to be safe (don't delete files outside target)
-        return True
+def _combine_include_patterns(spec: pathspec.PathSpec) -> re.Pattern[str] | None:
+    """Join the spec's pattern regexes into one, or return None if that could change the result."""
+    regexes = []
+    for pattern in spec.patterns:
+        if pattern.include is None:
+            # Blank or comment line
+            continue
+        regex = getattr(pattern, "regex", None)
+        if not pattern.include or regex is None or not isinstance(regex.pattern, str):
+            return None
+        if regex.flags != re.compile("").flags:
+            return None
+        regexes.append(_NAMED_GROUP_RE.sub("(?:", regex.pattern))
+
+    if not regexes:
+        return None
+    return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+
+def _literal_name(pattern: str) -> str | None:
+    """Return the name a pattern matches when it is a plain file or directory name, else None."""
+    name = pattern[:-1] if pattern.endswith("/") else pattern
+    if not name or name in (".", "..") or "/" in name or name[0] in "!#" or not _GLOB_CHARS.isdisjoint(name):
+        return None
+    return name
+
+
+def compile_protected_patterns(protected_patterns: set[str]) -> ProtectionSpec:
+    """
+    Compile gitignore-style protection patterns into a reusable ProtectionSpec.
+
+    Compile once per snap and pass the result to should_protect_file, instead of
+    letting every call re-normalize and re-compile the pattern set. Compiled specs
+    are cached by pattern set, so repeated snaps with the same config reuse them.
+    """
+    return _compile_patterns(frozenset(protected_patterns))
+
+
+def clear_protection_cache() -> None:
+    """Forget cached compiled protection patterns."""
+    _compile_patterns.cache_clear()
 
-    # Convert to POSIX-style path (forward slashes) for pathspec
-    relative_path_str = relative_path.as_posix()
 
+@lru_cache(maxsize=32)
+def _compile_patterns(protected_patterns: frozenset[str]) -> ProtectionSpec:
+    """Normalize and compile a pattern set; cached by compile_protected_patterns."""
     # Normalize patterns: ensure directory patterns work correctly
     normalized_patterns = []
+    glob_patterns = []
+    literal_names = set()
     for pattern in protected_patterns:
         pattern = pattern.strip()
         if not pattern or pattern.startswith("#"):
@@ -43,25 +120,57 @@ def should_protect_file(file: Path, base_path: Path, protected_patterns: set[str
         if pattern.endswith("/"):
             # Add pattern for the directory itself and everything inside
             dir_name = pattern.rstrip("/")
-            normalized_patterns.append(dir_name)
-            normalized_patterns.append(f"{dir_name}/**")
+            expanded = [dir_name, f"{dir_name}/**"]
         else:
-            normalized_patterns.append(pattern)
+            expanded = [pattern]
+        normalized_patterns.extend(expanded)
+
+        name = _literal_name(pattern)
+        if name is not None:
+            literal_names.add(name)
+        else:
+            glob_patterns.extend(expanded)
 
     # Create a PathSpec object from patterns (gitignore-style)
     spec = pathspec.PathSpec.from_lines("gitwildmatch", normalized_patterns)
+    if any(pattern.startswith("!") for pattern in normalized_patterns):
+        return ProtectionSpec(spec, frozenset(), spec)
+    return ProtectionSpec(spec, frozenset(literal_names), pathspec.PathSpec.from_lines("gitwildmatch", glob_patterns))
 
-    # Check if the file or any of its parent directories match
-    # This is crucial for directory-based protection
-    if spec.match_file(relative_path_str):
-        return True
 
-    # Also check each parent directory component
-    # E.g., for ".venv/bin/python", check ".venv", ".venv/bin", ".venv/bin/python"
-    parts = relative_path.parts
-    for i in range(1, len(parts) + 1):
-        partial_path = "/".join(parts[:i])
-        if spec.match_file(partial_path):
-            return True
+def should_protect_file(file: Path, base_path: Path, protected_patterns: set[str] | ProtectionSpec) -> bool:
+    """
+    Check if a file matches any protection pattern using gitignore-style matching.
+
+    Args:
+        file: File path to check
+        base_path: Base directory path
+        protected_patterns: Set of gitignore-style patterns, or a ProtectionSpec
+            returned by compile_protected_patterns
+
+    Returns:
+        True if file should be protected, False otherwise
+    """
+    if not protected_patterns:
+        return False
+
+    spec = (
+        protected_patterns
+        if isinstance(protected_patterns, ProtectionSpec)
+        else compile_protected_patterns(protected_patterns)
+    )
+
+    # Resolve both paths to handle absolute/relative path mismatches
+    file_resolved = file.resolve()
+    base_resolved = base_path.resolve()
+
+    try:
+        relative_path = file_resolved.relative_to(base_resolved)
+    except ValueError:
+        # File is outside base_path - this shouldn't happen in normal operation
+        # But if it does, we should protect it to be safe (don't delete files outside target)
+        return True
 
-    return False
+    # Convert to POSIX-style path (forward slashes) for pathspec, then check the file
+    # and each of its parent directories. This is crucial for directory-based protection.
+    return spec.protects(relative_path.as_posix())
@@ -1,22 +1,31 @@
+import os
 import random
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
 from rich import box
 from rich.console import Console
 from rich.panel import Panel
+from rich.progress import BarColumn, Progress, TaskProgressColumn, TextColumn
 from rich.table import Table
 from send2trash import send2trash
 
 from .config import get_default_protected_patterns, load_thanosignore, load_thanosrc
-from .protection import should_protect_file
-from .utils import get_files
-from .weights import calculate_file_weight, weighted_random_sample
+from .protection import ProtectionSpec, compile_protected_patterns, should_protect_file
+from .utils import get_files_and_symlinks
+from .weights import CompiledWeights, calculate_file_weights, compile_weights, weighted_random_sample
 
 console = Console()
 
 
-def _print_header(percent: int, seed: Optional[int], use_trash: bool) -> None:
+# Deleting in worker threads only pays off for large snaps
+_PARALLEL_UNLINK_MIN_FILES = 256
+_UNLINK_WORKERS = 8
+
+
+def _print_header(percent: int, seed: Optional[int], use_trash: bool, console: Console) -> None:
     """Render the command header and selected options."""
     console.print()
     console.print(
@@ -37,7 +46,7 @@ def _print_header(percent: int, seed: Optional[int], use_trash: bool) -> None:
         console.print("🗑️  [cyan]Trash mode enabled:[/cyan] Files will be moved to trash")
 
 
-def _load_protected_patterns(directory: str, no_protect: bool) -> set[str]:
+def _load_protected_patterns(directory: str, no_protect: bool, console: Console) -> set[str]:
     """Load configured protection patterns."""
     protected_patterns: set[str] = set()
 
@@ -57,14 +66,30 @@ def _load_protected_patterns(directory: str, no_protect: bool) -> set[str]:
 
 
 def _split_files(
-    all_files: list[Path], base_path: Path, no_protect: bool, protected_patterns: set[str]
+    all_files: list[Path],
+    root: Path,
+    base_path: Path,
+    no_protect: bool,
+    protected_patterns: set[str],
+    symlinks: set[Path],
 ) -> tuple[list[Path], list[Path]]:
-    """Split files into eligible and protected groups."""
+    """
+    Split files into eligible and protected groups.
+
+    Files found by get_files(root) sit lexically below root, so their relative path is
+    taken from the path itself instead of resolving every file. Files in symlinks, as
+    reported by get_files_and_symlinks, are still checked through should_protect_file,
+    which protects links pointing outside base_path.
+    """
+    if no_protect or not protected_patterns:
+        return list(all_files), []
+
     files: list[Path] = []
     protected_files: list[Path] = []
+    spec = compile_protected_patterns(protected_patterns)
 
     for file in all_files:
-        if not no_protect and should_protect_file(file, base_path, protected_patterns):
+        if _is_protected(file, root, base_path, spec, bool(symlinks) and file in symlinks):
             protected_files.append(file)
         else:
             files.append(file)
@@ -72,6 +97,17 @@ def _split_files(
     return files, protected_files
 
 
+def _is_protected(file: Path, root: Path, base_path: Path, spec: ProtectionSpec, is_link: bool) -> bool:
+    """Check a file found below root against the compiled protection patterns."""
+    if not spec or is_link:
+        return should_protect_file(file, base_path, spec)
+    try:
+        relative_path = file.relative_to(root)
+    except ValueError:
+        return should_protect_file(file, base_path, spec)
+    return spec.protects(relative_path.as_posix())
+
+
 def _get_elimination_count(total_files: int, percent: int) -> int:
     """Return the number of files to eliminate, or 0 if the snap would be a no-op."""
     if total_files < 1:
@@ -79,16 +115,18 @@ def _get_elimination_count(total_files: int, percent: int) -> int:
     return int(total_files * percent / 100)
 
 
-def _select_files(files: list[Path], weights_config: dict, files_to_eliminate: int, rng: random.Random) -> list[Path]:
+def _select_files(
+    files: list[Path], compiled_weights: Optional[CompiledWeights], files_to_eliminate: int, rng: random.Random
+) -> list[Path]:
     """Select files to eliminate, using configured weights when present."""
-    if weights_config:
-        weights = [calculate_file_weight(file, weights_config) for file in files]
+    if compiled_weights is not None:
+        weights = calculate_file_weights(files, compiled_weights)
         return weighted_random_sample(files, weights, files_to_eliminate, rng)
     return rng.sample(files, files_to_eliminate)
 
 
 def _print_balance_assessment(
-    all_files: list[Path], protected_files: list[Path], total_files: int, files_to_eliminate: int
+    all_files: list[Path], protected_files: list[Path], total_files: int, files_to_eliminate: int, console: Console
 ) -> None:
     """Render the file counts table."""
     console.print()
@@ -106,7 +144,9 @@ def _print_balance_assessment(
     console.print()
 
 
-def _print_dry_run(eliminated: list[Path], protected_files: list[Path], use_trash: bool, seed: Optional[int]) -> None:
+def _print_dry_run(
+    eliminated: list[Path], protected_files: list[Path], use_trash: bool, seed: Optional[int], console: Console
+) -> None:
     """Render dry-run results."""
     action = "moved to trash" if use_trash else "eliminated"
     console.print(
@@ -139,7 +179,7 @@ def _print_dry_run(eliminated: list[Path], protected_files: list[Path], use_tras
     )
 
 
-def _print_selected_files(eliminated: list[Path], use_trash: bool) -> None:
+def _print_selected_files(eliminated: list[Path], use_trash: bool, console: Console) -> None:
     """Render the selected files and the warning panel."""
     action = "moved to trash" if use_trash else "elimination"
     console.print(Panel(f"[bold red]📋 Files selected for {action}:[/bold red]", border_style="red"))
@@ -172,7 +212,73 @@ def _print_selected_files(eliminated: list[Path], use_trash: bool) -> None:
     console.print()
 
 
-def _execute_snap(eliminated: list[Path], use_trash: bool) -> None:
+def _trash_files(files: list[Path]) -> Iterator[tuple[Path, Optional[Exception]]]:
+    """Move files to trash, yielding (file, error) for each one."""
+    for file in files:
+        try:
+            send2trash(str(file))
+        except Exception as err:
+            yield file, err
+        else:
+            yield file, None
+
+
+def _unlink_files(files: list[Path]) -> Iterator[tuple[Path, Optional[Exception]]]:
+    """
+    Permanently delete files, yielding (file, error) for each one.
+
+    Files are grouped by parent directory and unlinked relative to an open directory
+    descriptor, so the kernel resolves each parent path once per directory rather than
+    once per file. Large snaps spanning several directories unlink the groups in a
+    thread pool; os.unlink releases the GIL, and keeping each directory on a single
+    worker avoids contending for the same directory lock.
+    """
+    # Work on plain strings: Path.parent/.name and Path.unlink() add per-file overhead
+    by_parent: dict[str, list[tuple[Path, str]]] = {}
+    for file in files:
+        parent, name = os.path.split(os.fspath(file))
+        by_parent.setdefault(parent or os.curdir, []).append((file, name))
+
+    if len(files) <= _PARALLEL_UNLINK_MIN_FILES or len(by_parent) < 2:
+        for parent, group in by_parent.items():
+            yield from _unlink_group(parent, group)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(_UNLINK_WORKERS, len(by_parent))) as executor:
+        futures = [executor.submit(_unlink_group, parent, group) for parent, group in by_parent.items()]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def _unlink_group(parent: str, group: list[tuple[Path, str]]) -> list[tuple[Path, Optional[Exception]]]:
+    """Unlink files that share a parent directory, falling back to full paths without dir_fd support."""
+    unlink = os.unlink
+    dir_fd = None
+    if unlink in os.supports_dir_fd:
+        try:
+            dir_fd = os.open(parent, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        except OSError:
+            dir_fd = None
+
+    results: list[tuple[Path, Optional[Exception]]] = []
+    try:
+        for file, name in group:
+            try:
+                if dir_fd is None:
+                    unlink(os.path.join(parent, name))
+                else:
+                    unlink(name, dir_fd=dir_fd)
+            except OSError as err:
+                results.append((file, err))
+            else:
+                results.append((file, None))
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return results
+
+
+def _execute_snap(eliminated: list[Path], use_trash: bool, console: Console) -> None:
     """Delete files or move them to trash, then render the summary."""
     action_label = "Moving files to trash" if use_trash else "Eliminating files"
     status_style = "yellow"
@@ -186,20 +292,23 @@ def _execute_snap(eliminated: list[Path], use_trash: bool) -> None:
     eliminated_count = 0
     failed_count = 0
 
-    with console.status(f"[bold {status_style}]{action_label}...[/bold {status_style}]"):
-        for file in eliminated:
-            try:
-                if use_trash:
-                    send2trash(str(file))
-                    success_message = "Moved to trash"
-                else:
-                    file.unlink()
-                    success_message = "Eliminated"
+    # Per-file success lines dominate runtime on large snaps; report progress and failures only
+    with Progress(
+        TextColumn(f"[bold {status_style}]{action_label}...[/bold {status_style}]"),
+        BarColumn(),
+        TaskProgressColumn(),
+        console=console,
+        refresh_per_second=4,
+    ) as progress:
+        task = progress.add_task(action_label, total=len(eliminated))
+        results = _trash_files(eliminated) if use_trash else _unlink_files(eliminated)
+        for file, err in results:
+            if err is None:
                 eliminated_count += 1
-                console.print(f"   [green]✓[/green] {success_message}: [dim]{file}[/dim]")
-            except Exception as err:
+            else:
                 failed_count += 1
                 console.print(f"   [red]❌[/red] Failed: [dim]{file}[/dim] - {err}")
+            progress.update(task, advance=1, refresh=False)
 
     summary_lines = [
         "[bold green]✨ The snap is complete.[/bold green]",
@@ -224,22 +333,37 @@ def snap(
     no_protect: bool = False,
     use_trash: bool = False,
     percent: int = 50,
+    input_fn: Optional[Callable[[str], str]] = None,
+    console: Optional[Console] = None,
 ):
-    """Execute the snap operation."""
+    """
+    Execute the snap operation.
+
+    Output goes to console (the module-level console when omitted), and input_fn reads
+    the confirmation answer given the prompt; it defaults to console.input.
+    """
+    # The parameter shadows the module-level console; look it up at call time so patching it still works
+    console = console if console is not None else globals()["console"]
     rng = random.Random(seed)
-    _print_header(percent, seed, use_trash)
-    protected_patterns = _load_protected_patterns(directory, no_protect)
+    _print_header(percent, seed, use_trash, console)
+    protected_patterns = _load_protected_patterns(directory, no_protect, console)
 
     # Load configuration
     config, config_file_path = load_thanosrc(directory)
     weights_config = config.get("weights", {})
+    compiled_weights = compile_weights(weights_config) if weights_config else None
     if weights_config:
         console.print(f"⚖️  [green]Weighted selection enabled from [bold]{config_file_path}[/bold][/green]")
 
-    # Get all files
-    all_files = get_files(directory, recursive)
+    # Get all files, skipping directories whose contents would all be protected anyway
+    exclude_dir = None
+    if not no_protect and protected_patterns:
+        exclude_dir = compile_protected_patterns(protected_patterns).protects
+    all_files, symlinks = get_files_and_symlinks(directory, recursive, exclude_dir)
     base_path = Path(directory).resolve()
-    files, protected_files = _split_files(all_files, base_path, no_protect, protected_patterns)
+    files, protected_files = _split_files(
+        all_files, Path(directory), base_path, no_protect, protected_patterns, symlinks
+    )
 
     total_files = len(files)
     files_to_eliminate = _get_elimination_count(total_files, percent)
@@ -262,21 +386,21 @@ def snap(
             )
         return
 
-    eliminated = _select_files(files, weights_config, files_to_eliminate, rng)
-    _print_balance_assessment(all_files, protected_files, total_files, files_to_eliminate)
+    eliminated = _select_files(files, compiled_weights, files_to_eliminate, rng)
+    _print_balance_assessment(all_files, protected_files, total_files, files_to_eliminate, console)
 
     if dry_run:
-        _print_dry_run(eliminated, protected_files, use_trash, seed)
+        _print_dry_run(eliminated, protected_files, use_trash, seed, console)
         return
 
-    _print_selected_files(eliminated, use_trash)
+    _print_selected_files(eliminated, use_trash, console)
 
     # Confirmation
-    confirm = console.input("[bold]Type 'snap' to proceed:[/bold] ")
+    confirm = (input_fn or console.input)("[bold]Type 'snap' to proceed:[/bold] ")
 
     if confirm.lower() != "snap":
         console.print()
         console.print(Panel("[yellow]Snap cancelled.[/yellow]\nThe universe remains unchanged.", border_style="yellow"))
         return
 
-    _execute_snap(eliminated, use_trash)
+    _execute_snap(eliminated, use_trash, console)
@@ -1,8 +1,34 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Optional
 
+# Walking top-level subdirectories in worker threads only pays off once there are a few of them
+_PARALLEL_WALK_MIN_SUBDIRS = 4
 
-def get_files(directory: str, recursive: bool = False) -> list[Path]:
-    """Get all files in the directory."""
+
+def get_files(
+    directory: str, recursive: bool = False, exclude_dir: Optional[Callable[[str], bool]] = None
+) -> list[Path]:
+    """
+    Get all files in the directory.
+
+    exclude_dir, if given, is called with the POSIX path of each subdirectory relative to
+    directory; returning True skips that subdirectory and everything below it.
+    """
+    files, _ = get_files_and_symlinks(directory, recursive, exclude_dir)
+    return files
+
+
+def get_files_and_symlinks(
+    directory: str, recursive: bool = False, exclude_dir: Optional[Callable[[str], bool]] = None
+) -> tuple[list[Path], set[Path]]:
+    """
+    Get all files in the directory, plus the subset of them that are symlinks.
+
+    Symlinks are recognized from the directory listing during the walk, so callers that
+    treat them specially do not need an lstat() per file. Arguments match get_files.
+    """
     path = Path(directory)
 
     if not path.exists():
@@ -12,8 +38,96 @@ def get_files(directory: str, recursive: bool = False) -> list[Path]:
         raise NotADirectoryError(f"'{directory}' is not a directory")
 
     if recursive:
-        files = [f for f in path.rglob("*") if f.is_file()]
+        return _walk_recursive(path, exclude_dir)
+
+    files, _, symlinks = _scan_dir(os.fspath(path))
+    return files, set(symlinks)
+
+
+def _walk_recursive(path: Path, exclude_dir: Optional[Callable[[str], bool]] = None) -> tuple[list[Path], set[Path]]:
+    """
+    Collect all files below path, and the symlinks among them.
+
+    Each top-level subdirectory is walked independently. When there are more than
+    _PARALLEL_WALK_MIN_SUBDIRS of them, the walks run in a thread pool so that directory
+    reads overlap (os.scandir releases the GIL while waiting on the filesystem).
+    Results are concatenated in scan order, so the file list stays deterministic.
+    """
+    root = os.fspath(path)
+    root_files, subdirs, root_symlinks = _scan_dir(root)
+    subdirs = _prune_dirs(subdirs, root, exclude_dir)
+
+    def walk(subdir: str) -> tuple[list[Path], list[Path]]:
+        return _walk_subtree(subdir, root, exclude_dir)
+
+    if len(subdirs) > _PARALLEL_WALK_MIN_SUBDIRS:
+        max_workers = min(32, (os.cpu_count() or 1) * 4, len(subdirs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            subtrees = list(executor.map(walk, subdirs))
     else:
-        files = [f for f in path.iterdir() if f.is_file()]
+        subtrees = [walk(subdir) for subdir in subdirs]
 
-    return files
+    files = root_files + [file for subtree_files, _ in subtrees for file in subtree_files]
+    symlinks = set(root_symlinks)
+    for _, subtree_symlinks in subtrees:
+        symlinks.update(subtree_symlinks)
+    return files, symlinks
+
+
+def _walk_subtree(
+    subtree: str, root: str = "", exclude_dir: Optional[Callable[[str], bool]] = None
+) -> tuple[list[Path], list[Path]]:
+    """Collect all files below subtree, and the symlinks among them, with an iterative os.scandir walk."""
+    files: list[Path] = []
+    symlinks: list[Path] = []
+    stack = [subtree]
+    while stack:
+        try:
+            dir_files, subdirs, dir_symlinks = _scan_dir(stack.pop())
+        except PermissionError:
+            # Skip unreadable subdirectories, like Path.rglob does
+            continue
+        files.extend(dir_files)
+        symlinks.extend(dir_symlinks)
+        stack.extend(reversed(_prune_dirs(subdirs, root, exclude_dir)))
+    return files, symlinks
+
+
+def _prune_dirs(subdirs: list[str], root: str, exclude_dir: Optional[Callable[[str], bool]]) -> list[str]:
+    """Drop subdirectories that exclude_dir rejects, passing it their POSIX path relative to root."""
+    if exclude_dir is None:
+        return subdirs
+    return [subdir for subdir in subdirs if not exclude_dir(_relative_posix(subdir, root))]
+
+
+def _relative_posix(path: str, root: str) -> str:
+    """Return a path produced by scanning below root as a POSIX path relative to root."""
+    # os.scandir joins entry names onto the scanned path, so root is always a plain prefix
+    relative = path[len(root) :].lstrip(os.sep)
+    return relative if os.sep == "/" else relative.replace(os.sep, "/")
+
+
+def _scan_dir(directory: str) -> tuple[list[Path], list[str], list[Path]]:
+    """
+    Return the files, subdirectory paths and file symlinks directly inside directory in one os.scandir pass.
+
+    DirEntry answers is_dir()/is_file()/is_symlink() from the directory listing itself on
+    most platforms, so regular files and directories cost no extra stat call. Symlinks to
+    files count as files and are also listed separately; symlinked directories are
+    reported as neither.
+    """
+    files: list[Path] = []
+    subdirs: list[str] = []
+    symlinks: list[Path] = []
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                file = Path(entry.path)
+                files.append(file)
+                if entry.is_symlink():
+                    symlinks.append(file)
+
+    return files, subdirs, symlinks
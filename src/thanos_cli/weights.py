@@ -1,11 +1,58 @@
 from __future__ import annotations
 
+import heapq
+import math
+import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
 
-def calculate_file_weight(file: Path, weights_config: dict) -> float:
+def _stat_chunk_size() -> int:
+    """Files per worker when stat()ing in parallel; THANOS_STAT_CHUNK_SIZE overrides the default."""
+    try:
+        return max(1, int(os.environ.get("THANOS_STAT_CHUNK_SIZE", "512")))
+    except ValueError:
+        return 512
+
+
+# stat() releases the GIL, so metadata-based weights for large batches are computed in chunks
+# on worker threads. Smaller chunks suit high-latency filesystems such as NFS.
+_STAT_CHUNK_SIZE = _stat_chunk_size()
+
+
+@dataclass(frozen=True)
+class CompiledWeights:
+    """
+    Weights config with range strings parsed once up front.
+
+    Ranges are stored as (min, max, weight) tuples in config order, where max is
+    math.inf for open-ended ranges such as "30+".
+    """
+
+    by_extension: dict[str, float]
+    by_age_days: list[tuple[float, float, float]]
+    by_size_mb: list[tuple[float, float, float]]
+
+    @property
+    def needs_stat(self) -> bool:
+        """Whether any configured weight depends on file metadata (age or size)."""
+        return bool(self.by_age_days or self.by_size_mb)
+
+
+def compile_weights(weights_config: dict) -> CompiledWeights:
+    """Parse the range strings of a weights config so they are not re-parsed for every file."""
+    return CompiledWeights(
+        by_extension=dict(weights_config.get("by_extension") or {}),
+        by_age_days=_compile_ranges(weights_config.get("by_age_days") or {}),
+        by_size_mb=_compile_ranges(weights_config.get("by_size_mb") or {}),
+    )
+
+
+def calculate_file_weight(file: Path, weights_config: dict | CompiledWeights, now: float | None = None) -> float:
     """
     Calculate elimination probability for a file based on weights.
     Returns a value between 0.0 (protect) and 1.0 (highly likely to eliminate).
@@ -17,17 +64,56 @@ def calculate_file_weight(file: Path, weights_config: dict) -> float:
     3. by_size_mb: Weight based on file size in megabytes
 
     When multiple weight types are specified, they are averaged.
+    File ages are measured against now (a Unix timestamp), defaulting to the current time.
     """
     if not weights_config:
         return 0.5
+    if isinstance(weights_config, dict):
+        weights_config = compile_weights(weights_config)
+
+    return _combined_weight(file, weights_config, time.time() if now is None else now)
+
+
+def calculate_file_weights(
+    files: list[Path], weights_config: dict | CompiledWeights, now: float | None = None
+) -> list[float]:
+    """
+    Calculate elimination probabilities for a batch of files.
+
+    Equivalent to calling calculate_file_weight for every file, but the config is
+    compiled and the current time is looked up once for the whole batch. When age or
+    size weights are configured, large batches are stat()ed on a thread pool.
+    """
+    if not weights_config:
+        return [0.5] * len(files)
+    if isinstance(weights_config, dict):
+        weights_config = compile_weights(weights_config)
+
+    # Non-optional locals: narrowing of now/weights_config does not carry into the closure
+    current = time.time() if now is None else now
+    compiled = weights_config
+
+    def weigh(chunk: list[Path]) -> list[float]:
+        return [_combined_weight(file, compiled, current) for file in chunk]
 
-    file_stats = _safe_file_stats(file)
+    if not compiled.needs_stat or len(files) <= _STAT_CHUNK_SIZE:
+        return weigh(files)
+
+    chunks = [files[i : i + _STAT_CHUNK_SIZE] for i in range(0, len(files), _STAT_CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4, len(chunks))) as executor:
+        return [weight for chunk_weights in executor.map(weigh, chunks) for weight in chunk_weights]
+
+
+def _combined_weight(file: Path, weights: CompiledWeights, now: float) -> float:
+    """Average the weights of every category the file matches, defaulting to 0.5."""
+    # Extension-only configs never need the stat() call
+    file_stats = _safe_file_stats(file) if weights.needs_stat else None
     matched = [
         w
         for w in [
-            _extension_weight(file, weights_config.get("by_extension", {})),
-            _age_weight(file_stats, weights_config.get("by_age_days", {})),
-            _size_weight(file_stats, weights_config.get("by_size_mb", {})),
+            _extension_weight(file, weights.by_extension),
+            _age_weight(file_stats, weights.by_age_days, now),
+            _size_weight(file_stats, weights.by_size_mb),
         ]
         if w is not None
     ]
@@ -50,129 +136,110 @@ def _extension_weight(file: Path, ext_weights: dict) -> float | None:
     return None
 
 
-def _age_weight(file_stats: tuple[float, int] | None, age_weights: dict) -> float | None:
+def _age_weight(
+    file_stats: tuple[float, int] | None, age_ranges: list[tuple[float, float, float]], now: float
+) -> float | None:
     """Return age-based weight when the file matches a configured range, else None."""
-    if not age_weights or file_stats is None:
-        return None
-    try:
-        age_days = (time.time() - file_stats[0]) / 86400
-        return _first_matching_weight(age_days, age_weights, _matches_age_range)
-    except ValueError:
+    if not age_ranges or file_stats is None:
         return None
+    age_days = (now - file_stats[0]) / 86400
+    return _first_matching_weight(age_days, age_ranges)
 
 
-def _size_weight(file_stats: tuple[float, int] | None, size_weights: dict) -> float | None:
+def _size_weight(file_stats: tuple[float, int] | None, size_ranges: list[tuple[float, float, float]]) -> float | None:
     """Return size-based weight when the file matches a configured range, else None."""
-    if not size_weights or file_stats is None:
-        return None
-    try:
-        size_mb = file_stats[1] / (1024 * 1024)
-        return _first_matching_weight(size_mb, size_weights, _matches_size_range)
-    except ValueError:
+    if not size_ranges or file_stats is None:
         return None
+    size_mb = file_stats[1] / (1024 * 1024)
+    return _first_matching_weight(size_mb, size_ranges)
 
 
-def _first_matching_weight(value: float, configured_weights: dict, matcher) -> float | None:
+def _first_matching_weight(value: float, ranges: list[tuple[float, float, float]]) -> float | None:
     """Return the first configured weight whose range matches value, else None."""
-    for range_name, weight in configured_weights.items():
-        if matcher(value, range_name):
+    for min_value, max_value, weight in ranges:
+        if min_value <= value < max_value:
             return weight
     return None
 
 
-def _matches_age_range(age_days: float, age_range: str) -> bool:
+def _compile_ranges(configured_weights: dict) -> list[tuple[float, float, float]]:
+    """Parse a range-to-weight mapping into (min, max, weight) tuples, skipping malformed ranges."""
+    compiled = []
+    for range_name, weight in configured_weights.items():
+        bounds = _parse_range(range_name)
+        if bounds is not None:
+            compiled.append((bounds[0], bounds[1], weight))
+    return compiled
+
+
+@lru_cache(maxsize=256)
+def _parse_range(range_name: str) -> tuple[float, float] | None:
     """
-    Check if age_days matches the given age range string.
+    Parse a range string into (min, max) bounds, or None when it is malformed.
+
+    Results are cached, so _matches_range and repeated compile_weights calls
+    parse each distinct range string once.
 
     Supported formats:
-    - "0-7": 0 to 7 days old
-    - "7-30": 7 to 30 days old
-    - "30+": 30 days or older
-    - "30-": 30 days or older (alternative syntax)
+    - "0-7": from 0 (inclusive) to 7 (exclusive)
+    - "30+": 30 or more
+    - "30-": 30 or more (alternative syntax)
     """
-    age_range = age_range.strip()
+    range_name = range_name.strip()
 
-    # Handle "30+" or "30-" format (30 or more days)
-    if age_range.endswith(("+", "-")):
-        min_age = float(age_range[:-1])
-        return age_days >= min_age
+    try:
+        # Handle "30+" or "30-" format (30 or more)
+        if range_name.endswith(("+", "-")):
+            return float(range_name[:-1]), math.inf
 
-    # Handle range format "min-max"
-    if "-" in age_range:
-        parts = age_range.split("-")
+        # Handle range format "min-max"
+        parts = range_name.split("-")
         if len(parts) == 2:
-            try:
-                min_age = float(parts[0])
-                max_age = float(parts[1])
-                return min_age <= age_days < max_age
-            except ValueError:
-                return False
+            return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
 
-    return False
+    return None
 
 
-def _matches_size_range(size_mb: float, size_range: str) -> bool:
+def _matches_range(value: float, range_name: str) -> bool:
     """
-    Check if size_mb matches the given size range string.
+    Check if value (an age in days or a size in MB) falls within the given range string.
 
     Supported formats:
-    - "0-1": 0 to 1 MB
-    - "1-10": 1 to 10 MB
-    - "10+": 10 MB or larger
-    - "10-": 10 MB or larger (alternative syntax)
+    - "0-7": from 0 (inclusive) to 7 (exclusive)
+    - "30+": 30 or more
+    - "30-": 30 or more (alternative syntax)
     """
-    size_range = size_range.strip()
+    bounds = _parse_range(range_name)
+    return bounds is not None and bounds[0] <= value < bounds[1]
 
-    # Handle "10+" or "10-" format (10 MB or larger)
-    if size_range.endswith(("+", "-")):
-        min_size = float(size_range[:-1])
-        return size_mb >= min_size
 
-    # Handle range format "min-max"
-    if "-" in size_range:
-        parts = size_range.split("-")
-        if len(parts) == 2:
-            try:
-                min_size = float(parts[0])
-                max_size = float(parts[1])
-                return min_size <= size_mb < max_size
-            except ValueError:
-                return False
-
-    return False
+# Age and size ranges share one syntax
+_matches_age_range = _matches_range
+_matches_size_range = _matches_range
 
 
 def weighted_random_sample(
     files: list[Path], weights: list[float], k: int, rng: random.Random | None = None
 ) -> list[Path]:
-    """Select k files using weighted random sampling."""
+    """
+    Select k files using weighted random sampling without replacement.
+
+    Uses Efraimidis-Spirakis keys: every file draws log(u) / weight and the k largest
+    keys are kept. This is equivalent to k successive weighted draws, but takes a single
+    O(n log k) pass instead of rescanning the remaining weights on every draw.
+
+    Files with a weight of 0 are only selected once all positively weighted files
+    have been taken, and then uniformly at random.
+    """
     if rng is None:
         rng = random.Random()
-    selected = []
-    remaining_files = list(files)
-    remaining_weights = list(weights)
-
-    for _ in range(k):
-        if not remaining_files:
-            break
-
-        # Weighted random choice
-        total = sum(remaining_weights)
-        if total == 0:
-            # Fallback to uniform if all weights are 0
-            idx = rng.randint(0, len(remaining_files) - 1)
-        else:
-            r = rng.uniform(0, total)
-            cumulative = 0
-            idx = 0
-            for i, w in enumerate(remaining_weights):
-                cumulative += w
-                if r <= cumulative:
-                    idx = i
-                    break
-
-        selected.append(remaining_files[idx])
-        remaining_files.pop(idx)
-        remaining_weights.pop(idx)
-
-    return selected
+    if k <= 0:
+        return []
+
+    # Keys are generated lazily, so only the k best (key, index) pairs are ever held in memory
+    keyed = (
+        ((True, math.log(1.0 - rng.random()) / w) if w > 0 else (False, rng.random()), i) for i, w in enumerate(weights)
+    )
+    return [files[i] for _, i in heapq.nlargest(k, keyed)]
@@ -1,60 +1,125 @@
 #!/usr/bin/env python
 
+import io
 import json
+import math
 import os
+import random
 import shutil
 import tempfile
 import time
+from collections import Counter
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
+from rich.console import Console
 
+from thanos_cli import config as config_module
 from thanos_cli.cli import init
-from thanos_cli.config import get_default_protected_patterns, load_thanosignore, load_thanosrc
-from thanos_cli.protection import should_protect_file
+from thanos_cli.config import clear_cache, get_default_protected_patterns, load_thanosignore, load_thanosrc
+from thanos_cli.protection import compile_protected_patterns, should_protect_file
 from thanos_cli.snap import snap
-from thanos_cli.utils import get_files
-from thanos_cli.weights import _matches_age_range, _matches_size_range, calculate_file_weight, weighted_random_sample
+from thanos_cli.utils import get_files, get_files_and_symlinks
+from thanos_cli.weights import (
+    _matches_age_range,
+    _matches_size_range,
+    calculate_file_weight,
+    calculate_file_weights,
+    compile_weights,
+    weighted_random_sample,
+)
+
+
+@pytest.fixture(scope="session")
+def _session_root():
+    """Create one base directory for the whole test session, in RAM when /dev/shm is available."""
+    shm = "/dev/shm"
+    root = Path(tempfile.mkdtemp(dir=shm if os.path.isdir(shm) and os.access(shm, os.W_OK) else None))
+    yield root
+    # Cleanup
+    shutil.rmtree(root, ignore_errors=True)
 
 
 @pytest.fixture
-def temp_dir():
+def temp_dir(_session_root):
     """Create a temporary directory for testing."""
-    tmpdir = tempfile.mkdtemp()
-    yield Path(tmpdir)
-    # Cleanup
-    shutil.rmtree(tmpdir, ignore_errors=True)
+    yield Path(tempfile.mkdtemp(dir=_session_root))
+    # Config files and compiled patterns are cached per process; don't leak them into the next test
+    clear_cache()
+
+
+# Fixed reference time for age-based weight tests
+_NOW = 1_700_000_000.0
+
+
+def _make_files(root: Path, names_and_bytes):
+    """Create files under root from (relative name, content) pairs with raw os.open/os.write calls."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    root_str = os.fspath(root)
+    for name, data in names_and_bytes:
+        fd = os.open(os.path.join(root_str, name), flags, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+def _make_sparse_file(path: Path, size: int) -> None:
+    """Create a file of the given size without writing its content; weights only look at st_size."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _count_files(root: Path) -> int:
+    """Count regular files below root, using the entry types os.scandir reads from the directory listing."""
+    count = 0
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    count += 1
+    return count
+
+
+def _count_entries(directory: Path) -> int:
+    """Count the entries directly inside directory without building Path objects."""
+    with os.scandir(directory) as entries:
+        return sum(1 for _ in entries)
+
+
+@pytest.fixture(scope="class")
+def quiet_console():
+    """A console that discards snap output, for tests that only inspect the filesystem."""
+    return Console(file=io.StringIO(), force_terminal=False)
 
 
 @pytest.fixture
 def populated_dir(temp_dir):
     """Create a directory with test files."""
     # Create 10 test files
-    for i in range(10):
-        (temp_dir / f"file_{i}.txt").write_text(f"Content {i}")
+    _make_files(temp_dir, [(f"file_{i}.txt", b"Content %d" % i) for i in range(10)])
     return temp_dir
 
 
 @pytest.fixture
 def nested_dir(temp_dir):
     """Create a directory with nested subdirectories and files."""
-    # Root level files
-    for i in range(6):
-        (temp_dir / f"root_{i}.txt").write_text(f"Root {i}")
-
-    # Subdirectory with files
-    subdir = temp_dir / "subdir"
-    subdir.mkdir()
-    for i in range(4):
-        (subdir / f"sub_{i}.txt").write_text(f"Sub {i}")
-
-    # Nested subdirectory
-    nested = subdir / "nested"
-    nested.mkdir()
-    for i in range(2):
-        (nested / f"nested_{i}.txt").write_text(f"Nested {i}")
-
+    # Subdirectory and nested subdirectory
+    (temp_dir / "subdir" / "nested").mkdir(parents=True)
+
+    _make_files(
+        temp_dir,
+        [(f"root_{i}.txt", b"Root %d" % i) for i in range(6)]
+        + [(f"subdir/sub_{i}.txt", b"Sub %d" % i) for i in range(4)]
+        + [(f"subdir/nested/nested_{i}.txt", b"Nested %d" % i) for i in range(2)],
+    )
     return temp_dir
 
 
@@ -111,6 +176,38 @@ class TestGetFiles:
         files = get_files(str(nested_dir), recursive=True)
         assert len(files) == 12  # 6 root + 4 subdir + 2 nested
 
+    def test_get_files_recursive_many_subdirs(self, temp_dir):
+        """Test that recursive mode finds every file when subdirectories are walked in parallel."""
+        (temp_dir / "root.txt").write_text("root")
+        for i in range(8):
+            subdir = temp_dir / f"dir_{i}" / "inner"
+            subdir.mkdir(parents=True)
+            (subdir.parent / "a.txt").write_text("a")
+            (subdir / "b.txt").write_text("b")
+
+        files = get_files(str(temp_dir), recursive=True)
+        assert len(files) == 17
+        assert len(set(files)) == 17
+        assert files == get_files(str(temp_dir), recursive=True)  # Order is deterministic
+
+    def test_get_files_exclude_dir_prunes_subtrees(self, temp_dir):
+        """Test that excluded directories are not descended into."""
+        (temp_dir / "keep" / "node_modules" / "pkg").mkdir(parents=True)
+        (temp_dir / "keep" / "a.txt").write_text("a")
+        (temp_dir / "keep" / "node_modules" / "pkg" / "index.js").write_text("js")
+        (temp_dir / "node_modules").mkdir()
+        (temp_dir / "node_modules" / "b.js").write_text("b")
+
+        seen = []
+
+        def exclude_dir(relative_path):
+            seen.append(relative_path)
+            return relative_path.split("/")[-1] == "node_modules"
+
+        files = get_files(str(temp_dir), recursive=True, exclude_dir=exclude_dir)
+        assert files == [temp_dir / "keep" / "a.txt"]
+        assert sorted(seen) == ["keep", "keep/node_modules", "node_modules"]
+
     def test_get_files_nonexistent_directory(self):
         """Test that nonexistent directory raises FileNotFoundError."""
         with pytest.raises(FileNotFoundError):
@@ -130,6 +227,25 @@ class TestGetFiles:
         # Verify all returned items are files, not directories
         assert all(f.is_file() for f in files)
 
+    def test_get_files_and_symlinks_reports_file_links(self, temp_dir):
+        """Test that symlinked files are returned as files and listed as symlinks."""
+        (temp_dir / "sub").mkdir()
+        (temp_dir / "real.txt").write_text("real")
+        try:
+            (temp_dir / "link.txt").symlink_to(temp_dir / "real.txt")
+            (temp_dir / "sub" / "nested_link.txt").symlink_to(temp_dir / "real.txt")
+        except (OSError, NotImplementedError):
+            pytest.skip("Symlinks not supported")
+
+        files, symlinks = get_files_and_symlinks(str(temp_dir), recursive=True)
+        assert sorted(files) == sorted(
+            [temp_dir / "real.txt", temp_dir / "link.txt", temp_dir / "sub" / "nested_link.txt"]
+        )
+        assert symlinks == {temp_dir / "link.txt", temp_dir / "sub" / "nested_link.txt"}
+
+        files, symlinks = get_files_and_symlinks(str(temp_dir))
+        assert symlinks == {temp_dir / "link.txt"}
+
 
 class TestConfig:
     """Tests for configuration loading."""
@@ -161,6 +277,14 @@ class TestConfig:
         assert "*.log" in patterns
         assert "*.tmp" in patterns
 
+    def test_load_thanosignore_strips_whitespace(self, temp_dir):
+        """Test that indentation, trailing spaces and indented comments are handled."""
+        ignore_file = temp_dir / ".thanosignore"
+        ignore_file.write_text("  *.log  \n\t# indented comment\n\n   \nbuild/\t\nkeep # not a comment\n")
+
+        patterns, _ = load_thanosignore(str(temp_dir))
+        assert patterns == {"*.log", "build/", "keep # not a comment"}
+
     def test_load_thanosignore_from_parent(self, temp_dir):
         """Test that .thanosignore is found in parent directory."""
         ignore_file = temp_dir / ".thanosignore"
@@ -190,6 +314,63 @@ class TestConfig:
         assert config["weights"]["by_extension"][".tmp"] == 0.95
         assert path == config_file
 
+    def test_load_thanosignore_reloads_changed_file(self, temp_dir):
+        """Test that cached .thanosignore patterns are refreshed when the file changes."""
+        ignore_file = temp_dir / ".thanosignore"
+        ignore_file.write_text("*.log\n")
+
+        patterns, _ = load_thanosignore(str(temp_dir))
+        assert patterns == {"*.log"}
+
+        ignore_file.write_text("*.tmp\n*.bak\n")
+        future = time.time() + 10
+        os.utime(ignore_file, (future, future))
+
+        patterns, _ = load_thanosignore(str(temp_dir))
+        assert patterns == {"*.tmp", "*.bak"}
+
+    def test_load_thanosignore_detects_same_size_rewrite(self, temp_dir):
+        """Test that a same-size rewrite with the old mtime restored is still picked up."""
+        ignore_file = temp_dir / ".thanosignore"
+        ignore_file.write_text("*.log\n")
+        original = ignore_file.stat()
+
+        patterns, _ = load_thanosignore(str(temp_dir))
+        assert patterns == {"*.log"}
+
+        ignore_file.write_text("*.tmp\n")
+        os.utime(ignore_file, ns=(original.st_atime_ns, original.st_mtime_ns))
+
+        patterns, _ = load_thanosignore(str(temp_dir))
+        assert patterns == {"*.tmp"}
+
+    def test_load_thanosrc_uses_cache_until_cleared(self, temp_dir):
+        """Test that an unchanged .thanosrc.json is parsed once."""
+        config_file = temp_dir / ".thanosrc.json"
+        config_file.write_text(json.dumps({"weights": {"by_extension": {".log": 0.9}}}))
+
+        with patch("thanos_cli.config._parse_thanosrc", wraps=config_module._parse_thanosrc) as parse:
+            first, _ = load_thanosrc(str(temp_dir))
+            second, _ = load_thanosrc(str(temp_dir))
+            assert second == first
+            assert parse.call_count == 1
+
+            clear_cache()
+            third, _ = load_thanosrc(str(temp_dir))
+            assert third == first
+            assert parse.call_count == 2
+
+    def test_load_thanosrc_returns_independent_copies(self, temp_dir):
+        """Test that mutating a loaded config does not leak into later loads."""
+        config_file = temp_dir / ".thanosrc.json"
+        config_file.write_text(json.dumps({"weights": {"by_extension": {".log": 0.9}}}))
+
+        first, _ = load_thanosrc(str(temp_dir))
+        first["weights"]["by_extension"][".log"] = 0.1
+
+        second, _ = load_thanosrc(str(temp_dir))
+        assert second["weights"]["by_extension"][".log"] == 0.9
+
     def test_get_default_protected_patterns(self):
         """Test that default patterns include critical files."""
         patterns = get_default_protected_patterns()
@@ -258,6 +439,58 @@ class TestProtection:
         finally:
             shutil.rmtree(other_dir, ignore_errors=True)
 
+    def test_should_protect_with_compiled_patterns(self, temp_dir):
+        """Test that a precompiled PathSpec behaves like the raw pattern set."""
+        logs_dir = temp_dir / "logs"
+        logs_dir.mkdir()
+        (logs_dir / "app.txt").write_text("log")
+        (temp_dir / "notes.txt").write_text("notes")
+
+        patterns = {"logs/", "*.tmp"}
+        spec = compile_protected_patterns(patterns)
+        for file in [logs_dir / "app.txt", temp_dir / "notes.txt"]:
+            assert should_protect_file(file, temp_dir, spec) == should_protect_file(file, temp_dir, patterns)
+        assert should_protect_file(logs_dir / "app.txt", temp_dir, spec)
+        assert not should_protect_file(temp_dir / "notes.txt", temp_dir, spec)
+
+    def test_compiled_patterns_match_like_pathspec(self):
+        """Test that the combined regex agrees with pathspec's per-pattern matching."""
+        spec = compile_protected_patterns(get_default_protected_patterns() | {"/build", "src/**/gen/", "[ab]?.txt"})
+        paths = [
+            ".git/config",
+            "src/.venv/bin/python",
+            "app.pyc",
+            "notes.txt",
+            "build/out.o",
+            "lib/build/out.o",
+            "src/a/gen/x.py",
+            "ab.txt",
+            "abc.txt",
+            "deep/dir/.env.local",
+            "poetry.lock.bak",
+        ]
+        for path in paths:
+            assert spec.match(path) == spec.spec.match_file(path), path
+
+    def test_negated_patterns_fall_back_to_pathspec(self):
+        """Test that specs with negated patterns are matched by pathspec itself."""
+        spec = compile_protected_patterns({"!keep.log"})
+        assert spec._glob_regex is None
+        assert not spec._literal_names
+        assert not spec.match("keep.log")
+
+    def test_literal_names_match_any_path_component(self):
+        """Test that plain-name patterns are matched by name and agree with pathspec."""
+        spec = compile_protected_patterns({".git/", "uv.lock", "*.pyc", "/build"})
+        assert spec._literal_names == {".git", "uv.lock"}
+        assert spec.protects("pkg/.git/objects/ab")
+        assert spec.protects("sub/uv.lock")
+        assert spec.protects("build/out.o")
+        assert not spec.protects("lib/build/out.o")
+        assert not spec.protects("uv.lock.bak")
+        for path in ["pkg/.git/objects/ab", "sub/uv.lock", "uv.lock.bak", "a/.gitignore"]:
+            assert spec.match(path) == spec.spec.match_file(path), path
+
     def test_should_protect_with_empty_patterns(self, temp_dir):
         """Test that empty patterns means no protection."""
         test_file = temp_dir / "test.txt"
@@ -278,25 +511,20 @@ class TestSnap:
 
     def test_snap_deletes_half_files_no_protect(self, populated_dir):
         """Test that snap deletes approximately half the files with no protection."""
-        initial_count = len(list(populated_dir.iterdir()))
+        initial_count = _count_entries(populated_dir)
         assert initial_count == 10
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(populated_dir), no_protect=True)
+        snap(str(populated_dir), no_protect=True, input_fn=lambda _: "snap")
 
-        remaining_count = len(list(populated_dir.iterdir()))
+        remaining_count = _count_entries(populated_dir)
         assert remaining_count == 5  # Half of 10
 
     def test_snap_respects_protected_files(self, dir_with_protected_files):
         """Test that snap respects protected files."""
-        all_files = list(dir_with_protected_files.rglob("*"))
-        all_files = [f for f in all_files if f.is_file()]
-
         # Should have 5 regular + 1 .env + 1 git/config + 1 node_modules/package.json + 1 .venv/bin/python
-        assert len(all_files) == 9
+        assert _count_files(dir_with_protected_files) == 9
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(dir_with_protected_files))
+        snap(str(dir_with_protected_files), input_fn=lambda _: "snap")
 
         # Protected files should still exist
         assert (dir_with_protected_files / ".env").exists()
@@ -310,10 +538,9 @@ class TestSnap:
         for i in range(11):
             (temp_dir / f"file_{i}.txt").write_text(f"Content {i}")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), no_protect=True)
+        snap(str(temp_dir), no_protect=True, input_fn=lambda _: "snap")
 
-        remaining_count = len(list(temp_dir.iterdir()))
+        remaining_count = _count_entries(temp_dir)
         assert remaining_count == 6  # 11 // 2 = 5 deleted, 6 remain
 
     def test_snap_custom_percent(self, temp_dir):
@@ -321,10 +548,9 @@ class TestSnap:
         for i in range(10):
             (temp_dir / f"file_{i}.txt").write_text(f"Content {i}")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), no_protect=True, percent=30)
+        snap(str(temp_dir), no_protect=True, percent=30, input_fn=lambda _: "snap")
 
-        remaining_count = len(list(temp_dir.iterdir()))
+        remaining_count = _count_entries(temp_dir)
         assert remaining_count == 7  # int(10 * 0.30) = 3 deleted, 7 remain
 
     def test_snap_percent_100(self, temp_dir):
@@ -332,10 +558,9 @@ class TestSnap:
         for i in range(6):
             (temp_dir / f"file_{i}.txt").write_text(f"Content {i}")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), no_protect=True, percent=100)
+        snap(str(temp_dir), no_protect=True, percent=100, input_fn=lambda _: "snap")
 
-        remaining_count = len(list(temp_dir.iterdir()))
+        remaining_count = _count_entries(temp_dir)
         assert remaining_count == 0
 
     def test_snap_percent_dry_run_shows_correct_count(self, temp_dir, capsys):
@@ -345,29 +570,87 @@ class TestSnap:
 
         snap(str(temp_dir), dry_run=True, no_protect=True, percent=25)
 
-        remaining_count = len(list(temp_dir.iterdir()))
+        remaining_count = _count_entries(temp_dir)
         assert remaining_count == 20  # no files deleted in dry run
 
         captured = capsys.readouterr()
         assert "5" in captured.out  # int(20 * 0.25) = 5 files to eliminate
 
+    def test_snap_current_directory(self, populated_dir, monkeypatch):
+        """Test snap on a relative directory deletes files next to the working directory."""
+        monkeypatch.chdir(populated_dir)
+
+        snap(".", no_protect=True, input_fn=lambda _: "snap")
+
+        remaining_count = _count_entries(populated_dir)
+        assert remaining_count == 5
+
+    def test_snap_relative_directory_respects_protection(self, temp_dir, monkeypatch):
+        """Test that protection patterns apply to files found under a relative directory."""
+        project = temp_dir / "project"
+        (project / "logs").mkdir(parents=True)
+        (project / ".thanosignore").write_text("logs/\n*.keep\n")
+        (project / "logs" / "app.txt").write_text("log")
+        (project / "notes.keep").write_text("keep")
+        for i in range(4):
+            (project / f"file_{i}.txt").write_text("x")
+        monkeypatch.chdir(temp_dir)
+
+        snap("project", recursive=True, percent=100, input_fn=lambda _: "snap")
+
+        assert (project / "logs" / "app.txt").exists()
+        assert (project / "notes.keep").exists()
+        assert not any((project / f"file_{i}.txt").exists() for i in range(4))
+
+    def test_snap_protects_symlinks_outside_directory(self, temp_dir):
+        """Test that a symlink pointing outside the snap directory is never eliminated."""
+        outside = temp_dir / "outside.txt"
+        outside.write_text("outside")
+        target = temp_dir / "target"
+        target.mkdir()
+        (target / "local.txt").write_text("local")
+        try:
+            (target / "link.txt").symlink_to(outside)
+        except OSError:
+            pytest.skip("Symlinks not supported")
+
+        snap(str(target), percent=100, input_fn=lambda _: "snap")
+
+        assert (target / "link.txt").is_symlink()
+        assert not (target / "local.txt").exists()
+
+    def test_snap_writes_to_given_console(self, populated_dir, capsys):
+        """Test that snap prints through the console it is given."""
+        buffer = io.StringIO()
+        snap(str(populated_dir), dry_run=True, no_protect=True, console=Console(file=buffer, force_terminal=False))
+
+        assert "DRY RUN" in buffer.getvalue()
+        assert capsys.readouterr().out == ""
+
+    def test_snap_defaults_to_module_console(self, populated_dir):
+        """Test that snap prints through thanos_cli.snap.console when no console is given."""
+        buffer = io.StringIO()
+        with patch("thanos_cli.snap.console", Console(file=buffer, force_terminal=False)):
+            snap(str(populated_dir), dry_run=True, no_protect=True)
+
+        assert "DRY RUN" in buffer.getvalue()
+
     def test_snap_single_file(self, temp_dir):
         """Test snap with single file."""
         (temp_dir / "lonely.txt").write_text("alone")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), no_protect=True)
+        snap(str(temp_dir), no_protect=True, input_fn=lambda _: "snap")
 
-        remaining_count = len(list(temp_dir.iterdir()))
+        remaining_count = _count_entries(temp_dir)
         assert remaining_count == 1  # 1 // 2 = 0 deleted
 
     def test_snap_dry_run(self, populated_dir, capsys):
         """Test that dry run doesn't delete files."""
-        initial_count = len(list(populated_dir.iterdir()))
+        initial_count = _count_entries(populated_dir)
 
         snap(str(populated_dir), dry_run=True, no_protect=True)
 
-        remaining_count = len(list(populated_dir.iterdir()))
+        remaining_count = _count_entries(populated_dir)
         assert remaining_count == initial_count  # No files deleted
 
         captured = capsys.readouterr()
@@ -375,12 +658,11 @@ class TestSnap:
 
     def test_snap_cancelled(self, populated_dir, capsys):
         """Test that snap can be cancelled."""
-        initial_count = len(list(populated_dir.iterdir()))
+        initial_count = _count_entries(populated_dir)
 
-        with patch("rich.console.Console.input", return_value="no"):
-            snap(str(populated_dir), no_protect=True)
+        snap(str(populated_dir), no_protect=True, input_fn=lambda _: "no")
 
-        remaining_count = len(list(populated_dir.iterdir()))
+        remaining_count = _count_entries(populated_dir)
         assert remaining_count == initial_count  # No files deleted
 
         captured = capsys.readouterr()
@@ -388,15 +670,26 @@ class TestSnap:
 
     def test_snap_recursive(self, nested_dir):
         """Test snap in recursive mode."""
-        initial_files = len([f for f in nested_dir.rglob("*") if f.is_file()])
+        initial_files = _count_files(nested_dir)
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(nested_dir), recursive=True, no_protect=True)
+        snap(str(nested_dir), recursive=True, no_protect=True, input_fn=lambda _: "snap")
 
-        remaining_files = len([f for f in nested_dir.rglob("*") if f.is_file()])
+        remaining_files = _count_files(nested_dir)
         expected_remaining = initial_files - (initial_files // 2)
         assert remaining_files == expected_remaining
 
+    def test_snap_large_recursive_deletes_in_parallel(self, temp_dir):
+        """Test that a large snap across several directories deletes every selected file."""
+        for d in range(3):
+            subdir = temp_dir / f"dir_{d}"
+            subdir.mkdir()
+            for i in range(100):
+                (subdir / f"file_{i}.txt").write_text("x")
+
+        snap(str(temp_dir), recursive=True, no_protect=True, percent=100, input_fn=lambda _: "snap")
+
+        assert _count_files(temp_dir) == 0
+
     def test_snap_with_seed_reproducible(self, temp_dir):
         """Test that using the same seed produces the same file selection."""
         # Create test files
@@ -413,8 +706,8 @@ class TestSnap:
         random.seed(42)
         first_selection = set(random.sample(files, len(files) // 2))
 
-        # Second run with same seed (in a fresh temp dir)
-        temp_dir2 = Path(tempfile.mkdtemp())
+        # Second run with same seed (in a fresh temp dir on the same filesystem, so listing order matches)
+        temp_dir2 = Path(tempfile.mkdtemp(dir=temp_dir.parent))
         try:
             for i in range(10):
                 (temp_dir2 / f"file_{i}.txt").write_text(f"Content {i}")
@@ -443,8 +736,7 @@ class TestSnap:
         ignore_file = temp_dir / ".thanosignore"
         ignore_file.write_text("keep.txt\nimportant/\n")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), recursive=True)
+        snap(str(temp_dir), recursive=True, input_fn=lambda _: "snap")
 
         # Protected files should exist
         assert (temp_dir / "keep.txt").exists()
@@ -470,7 +762,8 @@ class TestSnap:
                 }
             }
         }
-        config_file.write_text(json.dumps(config_data))
+        config_bytes = json.dumps(config_data).encode()
+        config_file.write_bytes(config_bytes)
 
         # Run snap multiple times and check that .py and .json survive more often
         survivors = []
@@ -482,10 +775,9 @@ class TestSnap:
                 (temp_test / "log.log").write_text("log")
                 (temp_test / "data.json").write_text("data")
                 config_file_test = temp_test / ".thanosrc.json"
-                config_file_test.write_text(json.dumps(config_data))
+                config_file_test.write_bytes(config_bytes)
 
-                with patch("rich.console.Console.input", return_value="snap"):
-                    snap(str(temp_test), no_protect=True)
+                snap(str(temp_test), no_protect=True, input_fn=lambda _: "snap")
 
                 survivor_names = {f.name for f in temp_test.iterdir() if f.is_file() and f.name != ".thanosrc.json"}
                 survivors.append(survivor_names)
@@ -551,17 +843,16 @@ class TestEdgeCases:
 
     def test_snap_with_permission_error(self, populated_dir, capsys):
         """Test snap when file deletion fails."""
-        with patch("rich.console.Console.input", return_value="snap"):
-            # Mock unlink to raise PermissionError
-            original_unlink = Path.unlink
+        # Mock unlink to raise PermissionError
+        original_unlink = os.unlink
 
-            def mock_unlink(self, *args, **kwargs):
-                if "file_0" in str(self):
-                    raise PermissionError("Permission denied")
-                return original_unlink(self, *args, **kwargs)
+        def mock_unlink(path, *args, **kwargs):
+            if "file_0" in str(path):
+                raise PermissionError("Permission denied")
+            return original_unlink(path, *args, **kwargs)
 
-            with patch.object(Path, "unlink", mock_unlink):
-                snap(str(populated_dir), no_protect=True)
+        with patch("os.unlink", mock_unlink):
+            snap(str(populated_dir), no_protect=True, input_fn=lambda _: "snap")
 
         captured = capsys.readouterr()
         assert "Failed" in captured.out or "complete" in captured.out
@@ -571,10 +862,9 @@ class TestEdgeCases:
         (temp_dir / "file1.txt").write_text("one")
         (temp_dir / "file2.txt").write_text("two")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), no_protect=True)
+        snap(str(temp_dir), no_protect=True, input_fn=lambda _: "snap")
 
-        remaining = len(list(temp_dir.iterdir()))
+        remaining = _count_entries(temp_dir)
         assert remaining == 1  # 2 // 2 = 1 deleted, 1 remains
 
     def test_seed_with_zero(self, populated_dir, capsys):
@@ -710,6 +1000,47 @@ class TestWeightedSelection:
         assert weights[2] == 0.01  # .js
         assert weights[3] == 0.99  # .log
 
+    def test_bulk_weights_match_single_file_weights(self, temp_dir):
+        """Test that calculate_file_weights agrees with calculate_file_weight."""
+        files = []
+        for name in ["a.log", "b.py", "c.txt"]:
+            f = temp_dir / name
+            f.write_text("content")
+            files.append(f)
+
+        weights_config = {"by_extension": {".log": 0.9, ".py": 0.1}, "by_age_days": {"0-7": 0.3}}
+
+        assert calculate_file_weights(files, weights_config) == [
+            calculate_file_weight(f, weights_config) for f in files
+        ]
+        assert calculate_file_weights(files, {}) == [0.5, 0.5, 0.5]
+
+    def test_weights_use_given_now(self, temp_dir):
+        """Test that file ages are measured against an explicit now timestamp."""
+        f = temp_dir / "file.txt"
+        f.write_text("content")
+        os.utime(f, (1_000_000, 1_000_000))
+
+        weights_config = {"by_age_days": {"0-7": 0.2, "30+": 0.9}}
+
+        assert calculate_file_weight(f, weights_config, now=1_000_000 + 86400) == 0.2
+        assert calculate_file_weight(f, weights_config, now=1_000_000 + 60 * 86400) == 0.9
+        assert calculate_file_weights([f], weights_config, now=1_000_000 + 86400) == [0.2]
+
+    def test_bulk_weights_in_parallel_chunks(self, temp_dir, monkeypatch):
+        """Test that chunked, threaded stat() keeps weights in file order."""
+        files = []
+        for i in range(25):
+            f = temp_dir / f"file_{i}.{'log' if i % 3 else 'txt'}"
+            _make_sparse_file(f, i * 100_000)
+            files.append(f)
+
+        weights_config = {"by_extension": {".log": 0.9}, "by_size_mb": {"0-1": 0.2, "1+": 0.6}}
+        expected = [calculate_file_weight(f, weights_config, now=0.0) for f in files]
+
+        monkeypatch.setattr("thanos_cli.weights._STAT_CHUNK_SIZE", 4)
+        assert calculate_file_weights(files, weights_config, now=0.0) == expected
+
     def test_weighted_sample_respects_k(self, temp_dir):
         """Test that weighted_random_sample returns correct number of items."""
 
@@ -725,6 +1056,34 @@ class TestWeightedSelection:
         assert len(selected) == 5
         assert len(set(selected)) == 5  # All unique
 
+    def test_weighted_sample_zero_weights_picked_last(self):
+        """Test that zero-weight files are only selected after all weighted files."""
+        files = [Path(f"file_{i}.txt") for i in range(6)]
+        weights = [0.0, 0.9, 0.0, 0.1, 0.0, 0.5]
+
+        for seed in range(20):
+            selected = weighted_random_sample(files, weights, 3, random.Random(seed))
+            assert set(selected) == {files[1], files[3], files[5]}
+
+    def test_weighted_sample_k_exceeds_weighted_files(self):
+        """Test that k larger than the number of weighted files still returns k unique files."""
+        files = [Path(f"file_{i}.txt") for i in range(6)]
+        weights = [0.0, 0.9, 0.0, 0.0, 0.0, 0.0]
+
+        selected = weighted_random_sample(files, weights, 5, random.Random(7))
+        assert len(selected) == 5
+        assert len(set(selected)) == 5
+        assert selected[0] == files[1]
+
+    def test_weighted_sample_seed_reproducible(self):
+        """Test that the same seed selects the same files."""
+        files = [Path(f"file_{i}.txt") for i in range(50)]
+        weights = [(i % 7) / 7 for i in range(50)]
+
+        first = weighted_random_sample(files, weights, 20, random.Random(42))
+        second = weighted_random_sample(files, weights, 20, random.Random(42))
+        assert first == second
+
     def test_default_weight_neutral(self, temp_dir):
         """Test that files without specific weights get 0.5 (neutral)."""
 
@@ -742,6 +1101,7 @@ class TestWeightedSelection:
         # Create a recent file
         recent_file = temp_dir / "recent.txt"
         recent_file.write_text("content")
+        os.utime(recent_file, (_NOW - 86400, _NOW - 86400))
 
         weights_config = {
             "by_age_days": {
@@ -751,7 +1111,7 @@ class TestWeightedSelection:
             }
         }
 
-        weight = calculate_file_weight(recent_file, weights_config)
+        weight = calculate_file_weight(recent_file, weights_config, now=_NOW)
         assert weight == 0.2  # Should match 0-7 range
 
     def test_age_based_weights_old_files(self, temp_dir):
@@ -762,7 +1122,7 @@ class TestWeightedSelection:
         old_file.write_text("content")
 
         # Set modification time to 60 days ago
-        old_time = time.time() - (60 * 86400)
+        old_time = _NOW - (60 * 86400)
         os.utime(old_file, (old_time, old_time))
 
         weights_config = {
@@ -773,7 +1133,7 @@ class TestWeightedSelection:
             }
         }
 
-        weight = calculate_file_weight(old_file, weights_config)
+        weight = calculate_file_weight(old_file, weights_config, now=_NOW)
         assert weight == 0.9  # Should match 30+ range
 
     def test_age_based_weights_middle_range(self, temp_dir):
@@ -784,7 +1144,7 @@ class TestWeightedSelection:
         mid_file.write_text("content")
 
         # Set modification time to 15 days ago
-        mid_time = time.time() - (15 * 86400)
+        mid_time = _NOW - (15 * 86400)
         os.utime(mid_file, (mid_time, mid_time))
 
         weights_config = {
@@ -795,7 +1155,7 @@ class TestWeightedSelection:
             }
         }
 
-        weight = calculate_file_weight(mid_file, weights_config)
+        weight = calculate_file_weight(mid_file, weights_config, now=_NOW)
         assert weight == 0.5  # Should match 7-30 range
 
     def test_size_based_weights_small_files(self, temp_dir):
@@ -821,7 +1181,7 @@ class TestWeightedSelection:
 
         # Create a large file (> 10 MB)
         large_file = temp_dir / "large.bin"
-        large_file.write_bytes(b"x" * (11 * 1024 * 1024))  # 11 MB
+        _make_sparse_file(large_file, 11 * 1024 * 1024)  # 11 MB
 
         weights_config = {
             "by_size_mb": {
@@ -839,7 +1199,7 @@ class TestWeightedSelection:
 
         # Create a medium file (5 MB)
         medium_file = temp_dir / "medium.bin"
-        medium_file.write_bytes(b"x" * (5 * 1024 * 1024))  # 5 MB
+        _make_sparse_file(medium_file, 5 * 1024 * 1024)  # 5 MB
 
         weights_config = {
             "by_size_mb": {
@@ -857,10 +1217,10 @@ class TestWeightedSelection:
 
         # Create a file with known properties
         test_file = temp_dir / "test.log"
-        test_file.write_bytes(b"x" * (5 * 1024 * 1024))  # 5 MB
+        _make_sparse_file(test_file, 5 * 1024 * 1024)  # 5 MB
 
         # Set modification time to 15 days ago
-        mid_time = time.time() - (15 * 86400)
+        mid_time = _NOW - (15 * 86400)
         os.utime(test_file, (mid_time, mid_time))
 
         weights_config = {
@@ -877,47 +1237,77 @@ class TestWeightedSelection:
             },
         }
 
-        weight = calculate_file_weight(test_file, weights_config)
+        weight = calculate_file_weight(test_file, weights_config, now=_NOW)
         # Should average: (0.9 + 0.5 + 0.7) / 3 = 0.7
         assert abs(weight - 0.7) < 0.01
 
-    def test_age_range_formats(self, temp_dir):
+    @pytest.mark.parametrize(
+        "age_days, age_range, expected",
+        [
+            # "30+" format
+            (40, "30+", True),
+            (20, "30+", False),
+            # "30-" format (alternative)
+            (40, "30-", True),
+            (20, "30-", False),
+            # "0-7" format
+            (5, "0-7", True),
+            (10, "0-7", False),
+            # "7-30" format
+            (15, "7-30", True),
+            (5, "7-30", False),
+            (35, "7-30", False),
+        ],
+    )
+    def test_age_range_formats(self, age_days, age_range, expected):
         """Test different age range format syntaxes."""
-        # Test "30+" format
-        assert _matches_age_range(40, "30+")
-        assert not _matches_age_range(20, "30+")
-
-        # Test "30-" format (alternative)
-        assert _matches_age_range(40, "30-")
-        assert not _matches_age_range(20, "30-")
-
-        # Test "0-7" format
-        assert _matches_age_range(5, "0-7")
-        assert not _matches_age_range(10, "0-7")
-
-        # Test "7-30" format
-        assert _matches_age_range(15, "7-30")
-        assert not _matches_age_range(5, "7-30")
-        assert not _matches_age_range(35, "7-30")
-
-    def test_size_range_formats(self, temp_dir):
+        assert _matches_age_range(age_days, age_range) is expected
+
+    @pytest.mark.parametrize(
+        "size_mb, size_range, expected",
+        [
+            # "10+" format
+            (15, "10+", True),
+            (5, "10+", False),
+            # "10-" format (alternative)
+            (15, "10-", True),
+            (5, "10-", False),
+            # "0-1" format
+            (0.5, "0-1", True),
+            (1.5, "0-1", False),
+            # "1-10" format
+            (5, "1-10", True),
+            (0.5, "1-10", False),
+            (15, "1-10", False),
+        ],
+    )
+    def test_size_range_formats(self, size_mb, size_range, expected):
         """Test different size range format syntaxes."""
-        # Test "10+" format
-        assert _matches_size_range(15, "10+")
-        assert not _matches_size_range(5, "10+")
+        assert _matches_size_range(size_mb, size_range) is expected
+
+    def test_compile_weights_parses_ranges(self):
+        """Test that range strings are parsed once and malformed ranges are skipped."""
+        compiled = compile_weights(
+            {
+                "by_extension": {".log": 0.9},
+                "by_age_days": {"0-7": 0.2, "abc": 0.4, "30+": 0.9},
+                "by_size_mb": {" 10- ": 0.8, "x+": 0.1},
+            }
+        )
 
-        # Test "10-" format (alternative)
-        assert _matches_size_range(15, "10-")
-        assert not _matches_size_range(5, "10-")
+        assert compiled.by_extension == {".log": 0.9}
+        assert compiled.by_age_days == [(0.0, 7.0, 0.2), (30.0, math.inf, 0.9)]
+        assert compiled.by_size_mb == [(10.0, math.inf, 0.8)]
 
-        # Test "0-1" format
-        assert _matches_size_range(0.5, "0-1")
-        assert not _matches_size_range(1.5, "0-1")
+    def test_compile_weights_treats_null_categories_as_unset(self):
+        """Test that a category set to null is treated as not configured."""
+        compiled = compile_weights({"by_extension": {".log": 0.9}, "by_age_days": None, "by_size_mb": None})
 
-        # Test "1-10" format
-        assert _matches_size_range(5, "1-10")
-        assert not _matches_size_range(0.5, "1-10")
-        assert not _matches_size_range(15, "1-10")
+        assert compiled.by_extension == {".log": 0.9}
+        assert compiled.by_age_days == []
+        assert compiled.by_size_mb == []
+        assert not compiled.needs_stat
+        assert compile_weights({"by_extension": None}).by_extension == {}
 
     def test_weight_with_missing_file_stats(self, temp_dir):
         """Test that weight calculation handles missing file stats gracefully."""
@@ -950,20 +1340,30 @@ class TestWeightedSelection:
         weight = calculate_file_weight(test_file, weights_config)
         assert weight == 0.85
 
+    def test_weights_only_extension_skips_stat(self, temp_dir):
+        """Test that extension-only weights do not stat the file."""
+        test_file = temp_dir / "test.log"
+        test_file.write_text("content")
+
+        with patch.object(Path, "stat", side_effect=AssertionError("stat should not be called")):
+            assert calculate_file_weights([test_file], {"by_extension": {".log": 0.85}}) == [0.85]
+
     def test_weights_only_age(self, temp_dir):
         """Test weights with only age specified."""
         test_file = temp_dir / "test.txt"
         test_file.write_text("content")
 
+        os.utime(test_file, (_NOW - 86400, _NOW - 86400))
+
         weights_config = {"by_age_days": {"0-7": 0.25, "7+": 0.75}}
 
-        weight = calculate_file_weight(test_file, weights_config)
+        weight = calculate_file_weight(test_file, weights_config, now=_NOW)
         assert weight == 0.25  # Recent file
 
     def test_weights_only_size(self, temp_dir):
         """Test weights with only size specified."""
         test_file = temp_dir / "test.bin"
-        test_file.write_bytes(b"x" * (2 * 1024 * 1024))  # 2 MB
+        _make_sparse_file(test_file, 2 * 1024 * 1024)  # 2 MB
 
         weights_config = {"by_size_mb": {"0-1": 0.2, "1-5": 0.6, "5+": 0.9}}
 
@@ -1017,7 +1417,7 @@ class TestConfigDiscovery:
 class TestRealWorldScenarios:
     """Tests simulating real-world usage scenarios."""
 
-    def test_python_project_structure(self, temp_dir):
+    def test_python_project_structure(self, temp_dir, quiet_console):
         """Test snap on typical Python project."""
         # Create typical Python project structure
         (temp_dir / "main.py").write_text("print('hello')")
@@ -1036,14 +1436,13 @@ class TestRealWorldScenarios:
         all_files = list(temp_dir.rglob("*"))
         all_files = [f for f in all_files if f.is_file()]
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), recursive=True)
+        snap(str(temp_dir), recursive=True, input_fn=lambda _: "snap", console=quiet_console)
 
         # Critical files should survive
         assert (temp_dir / ".env").exists()
         assert (temp_dir / "venv" / "pyvenv.cfg").exists()
 
-    def test_node_project_structure(self, temp_dir):
+    def test_node_project_structure(self, temp_dir, quiet_console):
         """Test snap on typical Node.js project."""
         (temp_dir / "package.json").write_text('{"name": "app"}')
         (temp_dir / "index.js").write_text("console.log('hello')")
@@ -1054,52 +1453,50 @@ class TestRealWorldScenarios:
         pkg.mkdir()
         (pkg / "index.js").write_text("module.exports = {}")
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(temp_dir), recursive=True)
+        snap(str(temp_dir), recursive=True, input_fn=lambda _: "snap", console=quiet_console)
 
         # node_modules should be protected
         assert (node_modules / "express" / "index.js").exists()
 
-    def test_mixed_project_with_logs_and_cache(self, temp_dir):
+    @pytest.mark.slow
+    def test_mixed_project_with_logs_and_cache(self, temp_dir, quiet_console):
         """Test project with logs and cache that should be eliminated."""
-        # Important files
-        (temp_dir / "app.py").write_text("code")
-        (temp_dir / "config.yaml").write_text("config")
-
-        # Temporary files (should be eligible for elimination)
-        (temp_dir / "debug.log").write_text("logs")
-        (temp_dir / "cache.tmp").write_text("cache")
-        (temp_dir / "old.bak").write_text("backup")
-
-        # Create weighted config
-        config_file = temp_dir / ".thanosrc.json"
         config_data = {
             "weights": {"by_extension": {".log": 0.95, ".tmp": 0.95, ".bak": 0.90, ".py": 0.05, ".yaml": 0.05}}
         }
-        config_file.write_text(json.dumps(config_data))
+
+        # Build the project once; every trial gets a hardlinked copy of it
+        template = temp_dir / "_tpl"
+        template.mkdir()
+        _make_files(
+            template,
+            [
+                # Important files
+                ("app.py", b"code"),
+                ("config.yaml", b"config"),
+                # Temporary files (should be eligible for elimination)
+                ("debug.log", b"logs"),
+                ("cache.tmp", b"cache"),
+                ("old.bak", b"backup"),
+                # Weighted config
+                (".thanosrc.json", json.dumps(config_data).encode()),
+            ],
+        )
 
         # Run multiple times, important files should survive more often
-        survival_counts = {".py": 0, ".yaml": 0, ".log": 0, ".tmp": 0, ".bak": 0}
+        survival_counts = Counter()
 
         for trial in range(10):
             test_dir = temp_dir / f"trial_{trial}"
-            test_dir.mkdir()
-
-            (test_dir / "app.py").write_text("code")
-            (test_dir / "config.yaml").write_text("config")
-            (test_dir / "debug.log").write_text("logs")
-            (test_dir / "cache.tmp").write_text("cache")
-            (test_dir / "old.bak").write_text("backup")
-
-            config_trial = test_dir / ".thanosrc.json"
-            config_trial.write_text(json.dumps(config_data))
+            # Unlinking a hardlink leaves the template and the other trials intact
+            shutil.copytree(template, test_dir, copy_function=os.link)
 
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(test_dir), no_protect=True)
+            snap(str(test_dir), no_protect=True, input_fn=lambda _: "snap", console=quiet_console)
 
-            for f in test_dir.iterdir():
-                if f.suffix in survival_counts and f.is_file():
-                    survival_counts[f.suffix] += 1
+            with os.scandir(test_dir) as entries:
+                survival_counts.update(
+                    os.path.splitext(entry.name)[1] for entry in entries if entry.is_file(follow_symlinks=False)
+                )
 
         # Important files should survive significantly more often
         assert survival_counts[".py"] > survival_counts[".log"]
@@ -1112,8 +1509,7 @@ class TestTrashFunctionality:
     def test_trash_mode_moves_files_to_trash(self, populated_dir):
         """Test that trash mode uses send2trash instead of unlink."""
         with patch("thanos_cli.snap.send2trash") as mock_send2trash:
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(populated_dir), no_protect=True, use_trash=True)
+            snap(str(populated_dir), no_protect=True, use_trash=True, input_fn=lambda _: "snap")
 
         # send2trash should have been called for eliminated files
         assert mock_send2trash.called
@@ -1139,8 +1535,7 @@ class TestTrashFunctionality:
             eliminated_files_1.append(Path(path).name)
 
         with patch("thanos_cli.snap.send2trash", side_effect=track_files_1):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, seed=42, no_protect=True)
+            snap(str(temp_dir), use_trash=True, seed=42, no_protect=True, input_fn=lambda _: "snap")
 
         for i in range(10):
             (temp_dir / f"file_{i}.txt").write_text(f"Content {i}")
@@ -1152,8 +1547,7 @@ class TestTrashFunctionality:
             eliminated_files_2.append(Path(path).name)
 
         with patch("thanos_cli.snap.send2trash", side_effect=track_files_2):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, seed=42, no_protect=True)
+            snap(str(temp_dir), use_trash=True, seed=42, no_protect=True, input_fn=lambda _: "snap")
 
         # Same seed should eliminate same files
         assert set(eliminated_files_1) == set(eliminated_files_2)
@@ -1166,8 +1560,7 @@ class TestTrashFunctionality:
             eliminated_paths.append(str(path))
 
         with patch("thanos_cli.snap.send2trash", side_effect=track_eliminated):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(dir_with_protected_files), recursive=True, use_trash=True)
+            snap(str(dir_with_protected_files), recursive=True, use_trash=True, input_fn=lambda _: "snap")
 
         # Protected files should not be in eliminated list
         for path in eliminated_paths:
@@ -1184,8 +1577,7 @@ class TestTrashFunctionality:
                 raise Exception("Permission denied")
 
         with patch("thanos_cli.snap.send2trash", side_effect=send2trash_with_errors):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(populated_dir), use_trash=True, no_protect=True)
+            snap(str(populated_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         captured = capsys.readouterr()
         assert "Failed" in captured.out or "complete" in captured.out
@@ -1193,8 +1585,7 @@ class TestTrashFunctionality:
     def test_trash_mode_summary_message(self, populated_dir, capsys):
         """Test that trash mode shows correct summary with recovery note."""
         with patch("thanos_cli.snap.send2trash"):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(populated_dir), use_trash=True, no_protect=True)
+            snap(str(populated_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         captured = capsys.readouterr()
         assert "Moved to trash:" in captured.out
@@ -1209,11 +1600,10 @@ class TestTrashFunctionality:
             eliminated_count += 1
 
         with patch("thanos_cli.snap.send2trash", side_effect=count_eliminations):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(nested_dir), recursive=True, use_trash=True, no_protect=True)
+            snap(str(nested_dir), recursive=True, use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # Should eliminate approximately half of all files recursively
-        total_files = len([f for f in nested_dir.rglob("*") if f.is_file()])
+        total_files = _count_files(nested_dir)
         expected = total_files // 2
         # Allow some variance
         assert abs(eliminated_count - expected) <= 1
@@ -1235,8 +1625,7 @@ class TestTrashFunctionality:
             eliminated_files.append(Path(path).suffix)
 
         with patch("thanos_cli.snap.send2trash", side_effect=track_files):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, no_protect=True)
+            snap(str(temp_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # With high weights, .tmp and .log should be more likely to be eliminated
         # This is probabilistic, so we just verify the mechanism works
@@ -1259,8 +1648,7 @@ class TestTrashFunctionality:
             eliminated_paths.append(str(path))
 
         with patch("thanos_cli.snap.send2trash", side_effect=track_eliminated):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), recursive=True, use_trash=True)
+            snap(str(temp_dir), recursive=True, use_trash=True, input_fn=lambda _: "snap")
 
         # Protected files should not be eliminated
         for path in eliminated_paths:
@@ -1279,8 +1667,7 @@ class TestTrashFunctionality:
         (temp_dir / "lonely.txt").write_text("alone")
 
         with patch("thanos_cli.snap.send2trash") as mock_send2trash:
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, no_protect=True)
+            snap(str(temp_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # 1 // 2 = 0, so no files should be eliminated
         assert not mock_send2trash.called
@@ -1288,8 +1675,7 @@ class TestTrashFunctionality:
     def test_trash_mode_shows_file_count(self, populated_dir, capsys):
         """Test that trash mode shows count of moved files."""
         with patch("thanos_cli.snap.send2trash"):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(populated_dir), use_trash=True, no_protect=True)
+            snap(str(populated_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         captured = capsys.readouterr()
         # Should show "Moved to trash: X files"
@@ -1318,8 +1704,7 @@ class TestTrashEdgeCases:
             eliminated.append(Path(path).name)
 
         with patch("thanos_cli.snap.send2trash", side_effect=track_eliminated):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, no_protect=True)
+            snap(str(temp_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # At least one file should be eliminated
         assert len(eliminated) >= 0
@@ -1338,8 +1723,7 @@ class TestTrashEdgeCases:
             (temp_dir / filename).write_text("content")
 
         with patch("thanos_cli.snap.send2trash") as mock_send2trash:
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, no_protect=True)
+            snap(str(temp_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # Should handle special characters without errors
         assert mock_send2trash.called
@@ -1355,8 +1739,7 @@ class TestTrashEdgeCases:
             called_paths.append(str(path))
 
         with patch("thanos_cli.snap.send2trash", side_effect=capture_path):
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(temp_dir), use_trash=True, no_protect=True)
+            snap(str(temp_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # Verify send2trash was called with string paths
         if called_paths:
@@ -1375,8 +1758,7 @@ class TestTrashEdgeCases:
             (trash_dir / f"file_{i}.txt").write_text(f"Content {i}")
 
         with patch("thanos_cli.snap.send2trash") as mock_trash:
-            with patch("rich.console.Console.input", return_value="snap"):
-                snap(str(trash_dir), use_trash=True, no_protect=True)
+            snap(str(trash_dir), use_trash=True, no_protect=True, input_fn=lambda _: "snap")
 
         # Verify trash was used
         assert mock_trash.called
@@ -1387,13 +1769,12 @@ class TestTrashEdgeCases:
         for i in range(5):
             (delete_dir / f"file_{i}.txt").write_text(f"Content {i}")
 
-        initial_count = len(list(delete_dir.iterdir()))
+        initial_count = _count_entries(delete_dir)
 
-        with patch("rich.console.Console.input", return_value="snap"):
-            snap(str(delete_dir), use_trash=False, no_protect=True)
+        snap(str(delete_dir), use_trash=False, no_protect=True, input_fn=lambda _: "snap")
 
         # Verify normal deletion occurred
-        remaining_count = len(list(delete_dir.iterdir()))
+        remaining_count = _count_entries(delete_dir)
         assert remaining_count < initial_count
 
 